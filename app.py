@@ -1,14 +1,15 @@
 import os
-import json
+import importlib.util
 from datetime import date
-from typing import Dict, Any, List
+from typing import Any, Tuple
 
 import streamlit as st
 
-# LangChain bits
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_classic.output_parsers import StructuredOutputParser, ResponseSchema
-from langchain_openai import ChatOpenAI
+from llm_cache import LLMCache
+from planner_core import spec_to_json, plan_hash, render_itinerary
+from planner_langchain import (
+    ITINERARY_SCHEMA, SYSTEM_PROMPT, USER_TEMPLATE, get_chain, prewarm_connection, stream_itinerary
+)
 
 # ------------- UI CONFIG -------------
 st.set_page_config(page_title="AI Travel Planner", page_icon="✈️", layout="wide")
@@ -19,13 +20,25 @@ st.caption("Generate a personalized itinerary with budget, style, and preference
 # ------------- SIDEBAR -------------
 with st.sidebar:
     st.header("⚙️ Settings")
+    # Outside the settings form so a typed key is used right away, without clicking "Apply"
     api_key = st.text_input("OpenAI API Key", type="password", help="Or set OPENAI_API_KEY env var.")
     if not api_key:
         api_key = os.getenv("OPENAI_API_KEY", "")
 
-    # You can switch to another LangChain LLM (e.g., Anthropic, Groq) by swapping the import + class here
-    model_name = st.selectbox("Model", ["gpt-4o-mini", "gpt-4o", "gpt-5"], index=0)
-    temperature = st.slider("Creativity (temperature)", 0.0, 1.0, 0.7, 0.1)
+    # Model settings only apply on "Apply", so tweaking them doesn't rerun the whole page per tick
+    with st.form("settings", clear_on_submit=False):
+        # You can switch to another LangChain LLM (e.g., Anthropic, Groq) by swapping the class in planner_langchain.get_llm
+        model_name = st.selectbox("Model", ["gpt-4o-mini", "gpt-4o", "gpt-5"], index=0)
+        temperature = st.slider("Creativity (temperature)", 0.0, 1.0, 0.7, 0.1)
+        cache_anyway = st.checkbox(
+            "Reuse cached itineraries",
+            value=False,
+            help="Itineraries are always cached at temperature 0. Enable to also reuse them at higher creativity.",
+        )
+        st.form_submit_button("Apply")
+
+if api_key:
+    prewarm_connection(api_key)
 
 
 # ------------- FORM -------------
@@ -62,6 +75,7 @@ with st.form("trip_form"):
         )
 
     st.markdown("### Preferences")
+    # One two-column row holding both rows of preferences, instead of a separate st.columns per row
     col_1, col_2 = st.columns(2)
     with col_1:
         food = st.multiselect(
@@ -69,228 +83,67 @@ with st.form("trip_form"):
             ["Local Food", "Vegetarian", "Vegan", "Street Food", "Fine Dining", "Seafood", "Halal Options"],
             default=["Local Food", "Street Food"]
         )
+        avoid = st.text_area("Things to Avoid (e.g., long hikes, crowded places)", height=80)
     with col_2:
         must_include = st.text_area("Must Include (e.g., Eiffel Tower, Ghibli Museum)", height=80)
-    col_3, col_4 = st.columns(2)
-    with col_3:
-        avoid = st.text_area("Things to Avoid (e.g., long hikes, crowded places)", height=80)
-    with col_4:
         notes = st.text_area("Extra Notes (e.g., accessible-friendly, prefer sunrise spots)", height=80)
 
     submitted = st.form_submit_button("Generate Itinerary ✨")
 
 
-# ------------- STRUCTURED OUTPUT (LangChain) -------------
-# Define the JSON fields we expect
-response_schemas = [
-    ResponseSchema(name="summary", description=f"2-3 sentence overview in English."),
-    ResponseSchema(name="visa_and_tips", description="List of short bullet tips; include visa notes if relevant to passport and destination."),
-    ResponseSchema(
-        name="daily_plan",
-        description=(
-            "List of day objects (length equals duration_days). "
-            "Each day has: day (int), title (string), morning (list), afternoon (list), evening (list), "
-            "food (list), transport_notes (string), est_cost_usd (number)"
-        )
-    ),
-    ResponseSchema(name="total_estimated_cost_usd", description="Number: total rough cost in USD."),
-    ResponseSchema(name="map_links", description="Optional list of Google Maps links to major POIs."),
-    ResponseSchema(name="packing_or_seasonal_tips", description="List of short packing or season tips."),
-]
-
-parser = StructuredOutputParser.from_response_schemas(response_schemas)
-format_instructions = parser.get_format_instructions()
-
-
-def build_spec() -> Dict[str, Any]:
-
-    return {
-        "destination": destination,
-        "passport_country": passport_country,
-        "month_or_season": month,
-        "duration_days": duration_days,
-        "group": travel_group,
-        "budget_band": budget_band,
-        "daily_budget_usd": daily_budget if daily_budget > 0 else None,
-        "accommodation": accommodation,
-        "style": style,
-        "food": food,
-        "must_include": (must_include or "").strip() or None,
-        "avoid": (avoid or "").strip() or None,
-        "notes": (notes or "").strip() or None,
-    }
-
-
-def build_chain(api_key: str, model_name: str, temperature: float):
-    if not api_key:
-        raise RuntimeError("Missing API key. Add it in the sidebar or set OPENAI_API_KEY.")
-    llm = ChatOpenAI(api_key=api_key, model=model_name, temperature=temperature)
-    prompt = ChatPromptTemplate.from_messages(
-        [
-            ("system",
-             "You are a meticulous travel planner. "
-             "Use realistic timing & distances, respect budget/style, and keep safety in mind. "
-             "If info is uncertain, make sensible assumptions. "
-             "Return ONLY valid JSON in the following format:\n{format_instructions}"
-             ),
-            ("user", "Trip spec:\n{spec_json}")
-        ]
+def build_spec() -> Tuple[Tuple[str, Any], ...]:
+    """Snapshot the form as a hashable tuple of (field, value) pairs."""
+    return (
+        ("destination", destination),
+        ("passport_country", passport_country),
+        ("month_or_season", month),
+        ("duration_days", duration_days),
+        ("group", travel_group),
+        ("budget_band", budget_band),
+        ("daily_budget_usd", daily_budget if daily_budget > 0 else None),
+        ("accommodation", accommodation),
+        ("style", tuple(style)),
+        ("food", tuple(food)),
+        ("must_include", (must_include or "").strip() or None),
+        ("avoid", (avoid or "").strip() or None),
+        ("notes", (notes or "").strip() or None),
     )
-    # Runnable: prompt -> llm -> parser
-    return prompt | llm | parser
-
-
-def _render_list(items, prefix="- "):
-    """Helper to render items that might be a string or a list."""
-    if isinstance(items, str):
-        st.write(items)
-    elif isinstance(items, list):
-        for item in items:
-            st.write(f"{prefix}{item}")
-
-
-def render_itinerary(plan: Dict[str, Any]):
-    st.success(plan.get("summary", ""))
-
-    if plan.get("visa_and_tips"):
-        with st.expander("🛂 Visa & Practical Tips", expanded=True):
-            _render_list(plan["visa_and_tips"])
-
-    daily = plan.get("daily_plan", [])
-    if isinstance(daily, str):
-        st.markdown("## 🗓️ Daily Schedule")
-        st.write(daily)
-    else:
-        st.markdown("## 🗓️ Daily Schedule")
-        for day in daily:
-            day_num = day.get('day', '?') if isinstance(day, dict) else '?'
-            day_title = day.get('title', '') if isinstance(day, dict) else str(day)
-            with st.expander(f"Day {day_num}: {day_title}", expanded=(day_num == 1)):
-                if not isinstance(day, dict):
-                    st.write(day)
-                    continue
-                colA, colB, colC = st.columns(3)
-                for label, key in [("Morning", "morning"), ("Afternoon", "afternoon"), ("Evening", "evening")]:
-                    with (colA if label == "Morning" else colB if label == "Afternoon" else colC):
-                        st.markdown(f"**{label}**")
-                        items = day.get(key, [])
-                        if isinstance(items, str):
-                            st.write(items)
-                        else:
-                            for a in items:
-                                st.write(f"- {a}")
-
-                st.markdown("**Food**")
-                food = day.get("food", [])
-                if isinstance(food, str):
-                    st.write(food)
-                else:
-                    for f in food:
-                        st.write(f"- {f}")
-
-                st.markdown("**Transport Notes**")
-                st.info(day.get("transport_notes", ""))
-
-                if "est_cost_usd" in day:
-                    st.caption(f"Estimated daily cost: ~${day['est_cost_usd']}")
-
-    total_cost = plan.get("total_estimated_cost_usd")
-    if total_cost:
-        st.subheader(f"💰 Total Estimated Cost: ~${total_cost}")
-
-    if plan.get("map_links"):
-        st.markdown("### 🗺️ Useful Map Links")
-        for url in plan["map_links"]:
-            st.write(f"- {url}")
-
-    if plan.get("packing_or_seasonal_tips"):
-        st.markdown("### 🎒 Packing / Seasonal Tips")
-        for t in plan["packing_or_seasonal_tips"]:
-            st.write(f"- {t}")
-
-    st.markdown("---")
-    colx, coly = st.columns(2)
-    with colx:
-        st.download_button(
-            "⬇️ Download Itinerary (JSON)",
-            data=json.dumps(plan, ensure_ascii=False, indent=2),
-            file_name="itinerary.json",
-            mime="application/json",
-        )
-    with coly:
-        md = itinerary_to_markdown(plan)
-        st.download_button(
-            "⬇️ Download Itinerary (Markdown)",
-            data=md,
-            file_name="itinerary.md",
-            mime="text/markdown",
-        )
-
-
-def itinerary_to_markdown(plan: Dict[str, Any]) -> str:
-    lines: List[str] = []
-    lines.append("# AI Travel Planner Itinerary\n")
-    if plan.get("summary"):
-        lines.append(f"**Summary:** {plan['summary']}\n")
-
-    if plan.get("visa_and_tips"):
-        lines.append("## Visa & Tips")
-        for t in plan["visa_and_tips"]:
-            lines.append(f"- {t}")
-        lines.append("")
-
-    if plan.get("daily_plan"):
-        lines.append("## Daily Plan")
-        for d in plan["daily_plan"]:
-            lines.append(f"### Day {d.get('day')} – {d.get('title','')}")
-            for part in ["morning", "afternoon", "evening"]:
-                items = d.get(part, [])
-                if items:
-                    lines.append(f"**{part.capitalize()}:**")
-                    for it in items:
-                        lines.append(f"- {it}")
-            food = d.get("food", [])
-            if food:
-                lines.append("**Food:**")
-                for f in food:
-                    lines.append(f"- {f}")
-            if d.get("transport_notes"):
-                lines.append(f"**Transport Notes:** {d['transport_notes']}")
-            if "est_cost_usd" in d:
-                lines.append(f"_Estimated cost_: ${d['est_cost_usd']}")
-            lines.append("")
-
-    if plan.get("total_estimated_cost_usd"):
-        lines.append(f"**Total Estimated Cost**: ~${plan['total_estimated_cost_usd']}\n")
 
-    if plan.get("map_links"):
-        lines.append("## Map Links")
-        for u in plan["map_links"]:
-            lines.append(f"- {u}")
-        lines.append("")
 
-    if plan.get("packing_or_seasonal_tips"):
-        lines.append("## Packing / Seasonal Tips")
-        for t in plan["packing_or_seasonal_tips"]:
-            lines.append(f"- {t}")
-        lines.append("")
-    return "\n".join(lines)
+@st.cache_resource
+def get_llm_cache() -> LLMCache:
+    return LLMCache()
 
 
 # ------------- ACTION -------------
 if submitted:
     if not destination.strip():
         st.error("Please enter a destination.")
+    elif importlib.util.find_spec("langchain_openai") is None:
+        st.error("LangChain is not installed. Run `pip install langchain-openai`.")
     else:
         try:
-            spec = build_spec()
-            spec_json = json.dumps(spec, ensure_ascii=False, indent=2)
-            chain = build_chain(api_key, model_name, temperature)
-            with st.spinner("Planning your trip with ..."):
-                plan = chain.invoke({"spec_json": spec_json, "format_instructions": format_instructions})
-            # plan is already parsed (Python dict) thanks to parser
-            render_itinerary(plan)
+            spec_json = spec_to_json(build_spec())
+            chain = get_chain(api_key, model_name, temperature)
+            cache = get_llm_cache()
+            cacheable = LLMCache.is_cacheable(temperature, cache_anyway)
+            cache_key = LLMCache.cache_key(
+                model_name, temperature, spec_json, ITINERARY_SCHEMA, (SYSTEM_PROMPT, USER_TEMPLATE)
+            )
+            plan = cache.get(cache_key) if cacheable else None
+            if plan is None:
+                with st.spinner("Planning your trip with ..."):
+                    plan = stream_itinerary(chain, spec_json)
+                # plan is already parsed and validated (Python dict)
+                if cacheable:
+                    cache.set(cache_key, plan)
+            # Kept so reruns from unrelated widgets (settings, downloads) redraw without another LLM call
+            st.session_state["last_plan"] = plan
+            st.session_state["last_plan_key"] = plan_hash(plan)
+            render_itinerary(plan, st.session_state["last_plan_key"])
         except Exception as e:
             st.error(f"Failed to generate itinerary: {e}")
+elif "last_plan" in st.session_state:
+    render_itinerary(st.session_state["last_plan"], st.session_state["last_plan_key"])
 else:
     st.info("Fill the form and click **Generate Itinerary ✨**.")
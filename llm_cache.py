@@ -0,0 +1,60 @@
+import hashlib
+import threading
+from typing import Dict, Any, Optional, Tuple
+
+import diskcache
+import orjson
+
+
+class LLMCache:
+    """Persistent cache of generated itineraries, keyed on the full request.
+
+    Hits are served from an in-process dict first and fall back to an on-disk
+    diskcache store, so identical trip specs skip the OpenAI round-trip even
+    across sessions and restarts.
+    """
+
+    def __init__(self, directory: str = "./.itin_cache", memory_size: int = 256):
+        self._disk = diskcache.Cache(directory)
+        self._memory: Dict[str, Dict[str, Any]] = {}
+        self._memory_size = memory_size
+        # One instance is shared by every Streamlit session thread via st.cache_resource.
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def cache_key(
+        model: str, temperature: float, spec_json: str, schema: Dict[str, Any], prompts: Tuple[str, ...]
+    ) -> str:
+        payload = {
+            "model": model,
+            "temperature": temperature,
+            "spec": spec_json,
+            "schema": schema,
+            # Prompt text is part of the key so edits to it don't keep serving plans from the old prompt.
+            "prompts": prompts,
+        }
+        return hashlib.sha256(orjson.dumps(payload, option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+    @staticmethod
+    def is_cacheable(temperature: float, cache_anyway: bool = False) -> bool:
+        # With temperature > 0 the model is not deterministic, so only cache on opt-in.
+        return temperature <= 0.0 or cache_anyway
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        plan = self._memory.get(key)
+        if plan is None:
+            plan = self._disk.get(key)
+            if plan is not None:
+                self._remember(key, plan)
+        return plan
+
+    def set(self, key: str, plan: Dict[str, Any]) -> None:
+        self._disk.set(key, plan)
+        self._remember(key, plan)
+
+    def _remember(self, key: str, plan: Dict[str, Any]) -> None:
+        with self._lock:
+            if len(self._memory) >= self._memory_size:
+                # Evict the oldest entry (dicts keep insertion order).
+                self._memory.pop(next(iter(self._memory)), None)
+            self._memory[key] = plan
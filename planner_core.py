@@ -0,0 +1,170 @@
+import io
+import hashlib
+from typing import Dict, Any, Optional, Tuple
+
+import orjson
+import streamlit as st
+
+
+def dumps(obj: Any) -> bytes:
+    """Pretty-printed UTF-8 JSON; like json.dumps(ensure_ascii=False, indent=2), but via orjson."""
+    return orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+
+
+# st.cache_data is process-wide and shared by every session, so keep it bounded (in line with LLMCache)
+_MAX_CACHE_ENTRIES = 256
+
+
+@st.cache_data(max_entries=_MAX_CACHE_ENTRIES)
+def spec_to_json(spec: Tuple[Tuple[str, Any], ...]) -> str:
+    """Canonical JSON for a spec; used both in the prompt and as the response cache key."""
+    return dumps(dict(spec)).decode()
+
+
+def _cost(value: Any) -> Any:
+    """Show whole-dollar float costs (e.g. 10.0 from older cached plans) without the trailing ".0"."""
+    return int(value) if isinstance(value, float) and value.is_integer() else value
+
+
+def plan_hash(plan: Dict[str, Any]) -> str:
+    """Content hash of a plan, computed once per generation and used to key the download caches."""
+    return hashlib.sha256(dumps(plan)).hexdigest()
+
+
+# The leading underscore keeps Streamlit from hashing the plan itself; plan_key identifies it.
+@st.cache_data(max_entries=_MAX_CACHE_ENTRIES)
+def plan_as_json_bytes(plan_key: str, _plan: Dict[str, Any]) -> bytes:
+    return dumps(_plan)
+
+
+@st.cache_data(max_entries=_MAX_CACHE_ENTRIES)
+def plan_as_markdown(plan_key: str, _plan: Dict[str, Any]) -> str:
+    return itinerary_to_markdown(_plan)
+
+
+# (label, key) for the three time-of-day columns of a day
+_DAY_PARTS = [("Morning", "morning"), ("Afternoon", "afternoon"), ("Evening", "evening")]
+
+
+def _render_list(items, prefix="- ", title: Optional[str] = None):
+    """Helper to render items that might be a string or a list, as a single markdown element."""
+    heading = [f"**{title}**"] if title else []
+    if isinstance(items, str):
+        st.markdown("\n\n".join(heading + [items]))
+    elif isinstance(items, list):
+        st.markdown("\n".join(heading + [f"{prefix}{item}" for item in items]))
+    elif heading:
+        st.markdown(heading[0])
+
+
+@st.fragment
+def render_itinerary(plan: Dict[str, Any], plan_key: str):
+    st.success(plan.get("summary", ""))
+
+    if plan.get("visa_and_tips"):
+        with st.expander("🛂 Visa & Practical Tips", expanded=True):
+            _render_list(plan["visa_and_tips"])
+
+    daily = plan.get("daily_plan", [])
+    if isinstance(daily, str):
+        st.markdown("## 🗓️ Daily Schedule")
+        st.write(daily)
+    else:
+        st.markdown("## 🗓️ Daily Schedule")
+        for day in daily:
+            day_num = day.get('day', '?') if isinstance(day, dict) else '?'
+            day_title = day.get('title', '') if isinstance(day, dict) else str(day)
+            with st.expander(f"Day {day_num}: {day_title}", expanded=(day_num == 1)):
+                if not isinstance(day, dict):
+                    st.write(day)
+                    continue
+                for (label, key), col in zip(_DAY_PARTS, st.columns(len(_DAY_PARTS))):
+                    with col:
+                        _render_list(day.get(key, []), title=label)
+
+                _render_list(day.get("food", []), title="Food")
+
+                st.markdown("**Transport Notes**")
+                st.info(day.get("transport_notes", ""))
+
+                if "est_cost_usd" in day:
+                    st.caption(f"Estimated daily cost: ~${_cost(day['est_cost_usd'])}")
+
+    total_cost = plan.get("total_estimated_cost_usd")
+    if total_cost:
+        st.subheader(f"💰 Total Estimated Cost: ~${_cost(total_cost)}")
+
+    if plan.get("map_links"):
+        st.markdown("### 🗺️ Useful Map Links")
+        _render_list(plan["map_links"])
+
+    if plan.get("packing_or_seasonal_tips"):
+        st.markdown("### 🎒 Packing / Seasonal Tips")
+        _render_list(plan["packing_or_seasonal_tips"])
+
+    st.markdown("---")
+    colx, coly = st.columns(2)
+    with colx:
+        st.download_button(
+            "⬇️ Download Itinerary (JSON)",
+            data=plan_as_json_bytes(plan_key, plan),
+            file_name="itinerary.json",
+            mime="application/json",
+        )
+    with coly:
+        st.download_button(
+            "⬇️ Download Itinerary (Markdown)",
+            data=plan_as_markdown(plan_key, plan),
+            file_name="itinerary.md",
+            mime="text/markdown",
+        )
+
+
+def _write_bullets(w, items) -> None:
+    w("".join(f"- {item}\n" for item in items))
+
+
+def itinerary_to_markdown(plan: Dict[str, Any]) -> str:
+    buf = io.StringIO()
+    w = buf.write
+    w("# AI Travel Planner Itinerary\n\n")
+    if plan.get("summary"):
+        w(f"**Summary:** {plan['summary']}\n\n")
+
+    if plan.get("visa_and_tips"):
+        w("## Visa & Tips\n")
+        _write_bullets(w, plan["visa_and_tips"])
+        w("\n")
+
+    if plan.get("daily_plan"):
+        w("## Daily Plan\n")
+        for d in plan["daily_plan"]:
+            w(f"### Day {d.get('day')} – {d.get('title','')}\n")
+            for part in ["morning", "afternoon", "evening"]:
+                items = d.get(part, [])
+                if items:
+                    w(f"**{part.capitalize()}:**\n")
+                    _write_bullets(w, items)
+            food = d.get("food", [])
+            if food:
+                w("**Food:**\n")
+                _write_bullets(w, food)
+            if d.get("transport_notes"):
+                w(f"**Transport Notes:** {d['transport_notes']}\n")
+            if "est_cost_usd" in d:
+                w(f"_Estimated cost_: ${_cost(d['est_cost_usd'])}\n")
+            w("\n")
+
+    if plan.get("total_estimated_cost_usd"):
+        w(f"**Total Estimated Cost**: ~${_cost(plan['total_estimated_cost_usd'])}\n\n")
+
+    if plan.get("map_links"):
+        w("## Map Links\n")
+        _write_bullets(w, plan["map_links"])
+        w("\n")
+
+    if plan.get("packing_or_seasonal_tips"):
+        w("## Packing / Seasonal Tips\n")
+        _write_bullets(w, plan["packing_or_seasonal_tips"])
+        w("\n")
+    return buf.getvalue()
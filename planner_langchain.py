@@ -0,0 +1,257 @@
+import asyncio
+import threading
+from typing import Dict, Any, Iterator, List, Optional, Union
+
+import msgspec
+import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx
+
+# LangChain/OpenAI are imported inside the factories below: they take seconds to import. When an API
+# key is already known, prewarm_connection() imports the openai SDK (not LangChain) in a background
+# thread on first render, trading part of the lazy-import cold-start win for a warm connection;
+# LangChain itself loads on the first trip request.
+
+
+# ------------- STRUCTURED OUTPUT (OpenAI json_schema) -------------
+# Strict JSON Schema for the response. OpenAI enforces it during generation, so every object
+# lists all of its properties as required and forbids extra ones.
+def _text_list(description: str) -> Dict[str, Any]:
+    return {"type": "array", "items": {"type": "string"}, "description": description}
+
+
+def _strict_object(properties: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "type": "object",
+        "properties": properties,
+        "required": list(properties),
+        "additionalProperties": False,
+    }
+
+
+_DAY_SCHEMA = _strict_object({
+    "day": {"type": "integer"},
+    "title": {"type": "string"},
+    "morning": _text_list("Morning activities."),
+    "afternoon": _text_list("Afternoon activities."),
+    "evening": _text_list("Evening activities."),
+    "food": _text_list("Food and restaurant suggestions."),
+    "transport_notes": {"type": "string"},
+    "est_cost_usd": {"type": "number", "description": "Rough cost of the day in USD."},
+})
+
+ITINERARY_SCHEMA = _strict_object({
+    "summary": {"type": "string", "description": "2-3 sentence overview in English."},
+    "visa_and_tips": _text_list(
+        "Short bullet tips; include visa notes if relevant to passport and destination."
+    ),
+    "daily_plan": {
+        "type": "array",
+        "items": _DAY_SCHEMA,
+        "description": "One entry per day; length equals duration_days.",
+    },
+    "total_estimated_cost_usd": {"type": "number", "description": "Total rough cost in USD."},
+    "map_links": {
+        "type": ["array", "null"],
+        "items": {"type": "string"},
+        "description": "Optional Google Maps links to major POIs.",
+    },
+    "packing_or_seasonal_tips": _text_list("Short packing or season tips."),
+})
+
+_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {"name": "Itinerary", "schema": ITINERARY_SCHEMA, "strict": True},
+}
+
+
+SYSTEM_PROMPT = (
+    "You are a meticulous travel planner. "
+    "Use realistic timing & distances, respect budget/style, and keep safety in mind. "
+    "If info is uncertain, make sensible assumptions."
+)
+USER_TEMPLATE = "Trip spec:\n{spec_json}"
+
+
+@st.cache_resource
+def _get_prompt():
+    """Parsed once per process; only {spec_json} is substituted per request.
+
+    The system prompt is passed as a ready-made SystemMessage, so it is not treated as a template.
+    """
+    from langchain_core.messages import SystemMessage
+    from langchain_core.prompts import ChatPromptTemplate
+
+    return ChatPromptTemplate.from_messages(
+        [
+            SystemMessage(content=SYSTEM_PROMPT),
+            ("user", USER_TEMPLATE)
+        ]
+    )
+
+
+# Typed mirror of ITINERARY_SCHEMA; msgspec parses and validates the response in a single pass.
+# Costs are Union[int, float] so whole-dollar amounts stay ints and render as "$10", not "$10.0".
+class Day(msgspec.Struct):
+    day: int
+    title: str
+    morning: List[str]
+    afternoon: List[str]
+    evening: List[str]
+    food: List[str]
+    transport_notes: str
+    est_cost_usd: Union[int, float]
+
+
+class Itinerary(msgspec.Struct):
+    summary: str
+    visa_and_tips: List[str]
+    daily_plan: List[Day]
+    total_estimated_cost_usd: Union[int, float]
+    map_links: Optional[List[str]]
+    packing_or_seasonal_tips: List[str]
+
+
+_DECODER = msgspec.json.Decoder(Itinerary)
+
+
+def parse_plan(text: str) -> Dict[str, Any]:
+    """Decode the model's JSON into an Itinerary and return it as a plain dict.
+
+    The API already enforces the schema; this guards against truncated or refused responses.
+    """
+    return msgspec.to_builtins(_DECODER.decode(text))
+
+
+# How long idle pooled connections stay open. httpx defaults to 5s, which would drop the prewarmed
+# connection long before the user finishes filling in the trip form.
+_KEEPALIVE_SECONDS = 300.0
+# Bounds for the per-(api_key, model, temperature) caches, which hold users' API keys
+_MAX_CLIENTS = 16
+_CLIENT_TTL_SECONDS = 3600
+
+
+@st.cache_resource(show_spinner=False)
+def get_http_clients():
+    """Process-wide (sync, async) httpx clients shared by every ChatOpenAI and the prewarm.
+
+    Auth is sent per request, so one pool serves all keys, models and temperatures.
+    """
+    import httpx
+
+    limits = httpx.Limits(keepalive_expiry=_KEEPALIVE_SECONDS)
+    return httpx.Client(limits=limits), httpx.AsyncClient(limits=limits)
+
+
+@st.cache_resource(show_spinner=False, max_entries=_MAX_CLIENTS, ttl=_CLIENT_TTL_SECONDS)
+def get_llm(api_key: str, model_name: str, temperature: float):
+    """ChatOpenAI client on the shared HTTP pool, cached per (api_key, model, temperature)."""
+    if not api_key:
+        raise RuntimeError("Missing API key. Add it in the sidebar or set OPENAI_API_KEY.")
+    from langchain_openai import ChatOpenAI
+
+    http_client, http_async_client = get_http_clients()
+    return ChatOpenAI(
+        api_key=api_key,
+        model=model_name,
+        temperature=temperature,
+        http_client=http_client,
+        http_async_client=http_async_client,
+    )
+
+
+@st.cache_resource(max_entries=_MAX_CLIENTS, ttl=_CLIENT_TTL_SECONDS)
+def get_chain(api_key: str, model_name: str, temperature: float):
+    """Build the prompt -> llm -> text runnable once per (api_key, model, temperature)."""
+    from langchain_core.output_parsers import StrOutputParser
+
+    llm = get_llm(api_key, model_name, temperature)
+    # Runnable: prompt -> schema-constrained llm -> raw JSON text (parsed by the caller so it can be streamed)
+    return _get_prompt() | llm.bind(response_format=_RESPONSE_FORMAT) | StrOutputParser()
+
+
+# ttl matches the keepalive, so a key seen again after the pooled connection expired re-warms it
+@st.cache_resource(show_spinner=False, max_entries=_MAX_CLIENTS, ttl=_KEEPALIVE_SECONDS)
+def prewarm_connection(api_key: str) -> None:
+    """Open the OpenAI connection in the background so the first submission skips the TLS handshake.
+
+    Warms the shared async pool on the shared event loop, since that is what stream_itinerary uses.
+    Only the lightweight openai SDK is used here, not LangChain. Failures are ignored and surface
+    on the real request.
+    """
+    def _warm():
+        try:
+            from openai import AsyncOpenAI
+
+            client = AsyncOpenAI(api_key=api_key, http_client=get_http_clients()[1])
+
+            async def _list_models():
+                await client.models.list()
+
+            asyncio.run_coroutine_threadsafe(_list_models(), get_event_loop()).result()
+        except Exception:
+            pass
+
+    thread = threading.Thread(target=_warm, daemon=True)
+    add_script_run_ctx(thread)
+    thread.start()
+
+
+@st.cache_resource(show_spinner=False)
+def get_event_loop() -> asyncio.AbstractEventLoop:
+    """Long-lived event loop for async LLM calls.
+
+    The async HTTP pool inside ChatOpenAI is bound to the loop that opened it, so a fresh
+    asyncio.run() per submission would throw the pooled connections away.
+    """
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    return loop
+
+
+def _iter_on_loop(agen) -> Iterator[Any]:
+    """Drive an async iterator on the shared loop, yielding its items to the calling script thread.
+
+    Streamlit elements are only updated from the script thread, so the loop just fetches chunks.
+    """
+    loop = get_event_loop()
+    try:
+        while True:
+            try:
+                yield asyncio.run_coroutine_threadsafe(agen.__anext__(), loop).result()
+            except StopAsyncIteration:
+                return
+    finally:
+        asyncio.run_coroutine_threadsafe(agen.aclose(), loop).result()
+
+
+def _preview_markdown(partial: Dict[str, Any]) -> str:
+    lines: List[str] = []
+    if partial.get("summary"):
+        lines.append(str(partial["summary"]))
+    daily = partial.get("daily_plan")
+    if isinstance(daily, list):
+        for day in daily:
+            if isinstance(day, dict) and day.get("title"):
+                lines.append(f"- **Day {day.get('day', '?')}:** {day['title']}")
+    return "\n\n".join(lines)
+
+
+def stream_itinerary(chain, spec_json: str) -> Dict[str, Any]:
+    """Stream the model output, previewing the summary and each day as soon as they arrive.
+
+    The request goes through the async client (chain.astream) on the shared event loop.
+    """
+    from langchain_core.utils.json import parse_partial_json
+
+    placeholder = st.empty()
+    buffer = ""
+    for chunk in _iter_on_loop(chain.astream({"spec_json": spec_json})):
+        buffer += chunk
+        # Partial parsing walks the whole buffer, so only retry once a value has closed.
+        if "}" not in chunk and "]" not in chunk:
+            continue
+        partial = parse_partial_json(buffer)
+        if isinstance(partial, dict):
+            placeholder.markdown(_preview_markdown(partial))
+    placeholder.empty()
+    return parse_plan(buffer)